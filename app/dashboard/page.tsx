@@ -23,8 +23,14 @@ type Prediction = {
     fertilizer_recommendation?: { recommended_fertilizer?: string }
   }
 }
+type YieldStats = { count: number; mean: number | null; min: number | null; max: number | null }
+type PredictionSummary = YieldStats & {
+  by_crop: Record<string, YieldStats>
+  by_farm: Record<string, YieldStats>
+  latest: { request_id?: string; farm_id: string; crop: string; predicted_yield_kg_per_ha: number; created_at: any } | null
+}
 type FarmsResponse = { farms: Farm[] }
-type PredictionsResponse = { predictions: Prediction[] }
+type SummaryResponse = { summary: PredictionSummary; recent_predictions: Prediction[] }
 
 // Helper function to calculate “time ago”
 function getTimeAgo(timestamp: any) {
@@ -64,6 +70,7 @@ function getTimeAgo(timestamp: any) {
 export default function DashboardPage() {
   const { user, profile, loading } = useAuth()
   const [farms, setFarms] = useState<Farm[]>([])
+  const [summary, setSummary] = useState<PredictionSummary | null>(null)
   const [predictions, setPredictions] = useState<Prediction[]>([])
   const [isLoadingData, setIsLoadingData] = useState(true)
   const [lastPredictionTime, setLastPredictionTime] = useState<string | null>(null)
@@ -82,12 +89,13 @@ export default function DashboardPage() {
 
   const loadDashboardData = async () => {
     try {
-      const [farmsResponse, predictionsResponse] = await Promise.all([
+      const [farmsResponse, summaryResponse] = await Promise.all([
         apiClient.getFarms() as Promise<FarmsResponse>,
-        apiClient.getPredictions() as Promise<PredictionsResponse>,
+        apiClient.getSummary() as Promise<SummaryResponse>,
       ])
       setFarms(farmsResponse.farms)
-      setPredictions(predictionsResponse.predictions)
+      setSummary(summaryResponse.summary)
+      setPredictions(summaryResponse.recent_predictions)
     } catch (error) {
       console.error("Error loading dashboard data:", error)
     } finally {
@@ -97,24 +105,20 @@ export default function DashboardPage() {
 
   // Live-update last prediction time
   useEffect(() => {
-  if (!predictions.length) {
+  if (!summary?.latest) {
     setLastPredictionTime(null)
     return
   }
 
+  const latestPrediction = summary.latest
   const updateTime = () => {
-    const latestPrediction = [...predictions].sort(
-  (a, b) => b.created_at.seconds - a.created_at.seconds
-)[0]
-
-setLastPredictionTime(getTimeAgo(latestPrediction.created_at))
-
+    setLastPredictionTime(getTimeAgo(latestPrediction.created_at))
   }
 
   updateTime()
   const interval = setInterval(updateTime, 1000)
   return () => clearInterval(interval)
-}, [predictions])
+}, [summary])
 
 
   if (loading || isLoadingData) {
@@ -141,10 +145,7 @@ setLastPredictionTime(getTimeAgo(latestPrediction.created_at))
   };
   
 
-  const avgYield =
-    predictions.length > 0
-      ? predictions.reduce((sum, pred) => sum + (pred.outputs?.predicted_yield_kg_per_ha ?? 0), 0) / predictions.length
-      : 0
+  const avgYield = summary?.mean ?? 0
 
   return (
     <DashboardLayout>
@@ -158,7 +159,7 @@ setLastPredictionTime(getTimeAgo(latestPrediction.created_at))
         {/* Stats Cards */}
         <StatsCards
           totalFarms={farms.length}
-          totalPredictions={predictions.length}
+          totalPredictions={summary?.count ?? 0}
           avgYield={avgYield}
           lastPrediction={lastPredictionTime ?? "No predictions yet"}
         />
@@ -0,0 +1,162 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+# Request classes, in priority order: cheap reads/writes are only shed when the
+# whole process is saturated, predictions are shed first.
+CHEAP = "cheap"
+EXPENSIVE = "expensive"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `burst` saved"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume one token; return 0 on success or the seconds until one is available"""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """
+    Per-user rate limits plus process-wide in-flight limits.
+
+    Every request takes a token from the user's bucket for its class (429 when
+    empty) and a global in-flight slot (503 when the process is saturated).
+    Expensive requests may only use `max_in_flight - reserved_for_cheap` slots
+    and at most `max_expensive_in_flight` of them, so reads keep working while
+    predictions are being shed.
+    """
+
+    def __init__(self,
+                 max_in_flight: int = 64,
+                 reserved_for_cheap: int = 16,
+                 max_expensive_in_flight: int = 8,
+                 max_expensive_per_user: int = 2,
+                 rates: Optional[Dict[str, float]] = None,
+                 bursts: Optional[Dict[str, float]] = None,
+                 max_tracked_users: int = 10000,
+                 retry_after: int = 1):
+        self.max_in_flight = max_in_flight
+        self.reserved_for_cheap = reserved_for_cheap
+        self.max_expensive_in_flight = max_expensive_in_flight
+        self.max_expensive_per_user = max_expensive_per_user
+        self.rates = rates or {CHEAP: 5.0, EXPENSIVE: 0.2}
+        self.bursts = bursts or {CHEAP: 20.0, EXPENSIVE: 5.0}
+        self.max_tracked_users = max_tracked_users
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Dict[str, TokenBucket]]" = OrderedDict()
+        self._in_flight = {CHEAP: 0, EXPENSIVE: 0}
+        self._user_expensive: Dict[str, int] = {}
+        self.shed = {429: 0, 503: 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_in_flight=int(_env_float("ADMISSION_MAX_IN_FLIGHT", 64)),
+            reserved_for_cheap=int(_env_float("ADMISSION_RESERVED_FOR_READS", 16)),
+            max_expensive_in_flight=int(_env_float("ADMISSION_MAX_PREDICTIONS_IN_FLIGHT", 8)),
+            max_expensive_per_user=int(_env_float("ADMISSION_MAX_PREDICTIONS_PER_USER", 2)),
+            rates={
+                CHEAP: _env_float("ADMISSION_READ_RATE", 5.0),
+                EXPENSIVE: _env_float("ADMISSION_PREDICT_RATE", 0.2),
+            },
+            bursts={
+                CHEAP: _env_float("ADMISSION_READ_BURST", 20.0),
+                EXPENSIVE: _env_float("ADMISSION_PREDICT_BURST", 5.0),
+            },
+        )
+
+    def _user_bucket(self, uid: str, cls: str) -> TokenBucket:
+        buckets = self._buckets.get(uid)
+        if buckets is None:
+            buckets = {}
+            self._buckets[uid] = buckets
+            # Forget the least recently seen user so memory stays bounded
+            while len(self._buckets) > self.max_tracked_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(uid)
+
+        if cls not in buckets:
+            buckets[cls] = TokenBucket(self.rates[cls], self.bursts[cls])
+        return buckets[cls]
+
+    def _reject(self, code: int, retry_after: float, detail: str):
+        self.shed[code] += 1
+        seconds = self.retry_after if math.isinf(retry_after) else max(1, math.ceil(retry_after))
+        raise HTTPException(status_code=code, detail=detail, headers={"Retry-After": str(seconds)})
+
+    def acquire(self, uid: str, cls: str):
+        """Admit a request or raise HTTPException(429/503) with a Retry-After header"""
+        with self._lock:
+            total = sum(self._in_flight.values())
+            if total >= self.max_in_flight:
+                self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, self.retry_after, "Server is busy, please retry")
+
+            if cls == EXPENSIVE:
+                if (total >= self.max_in_flight - self.reserved_for_cheap
+                        or self._in_flight[EXPENSIVE] >= self.max_expensive_in_flight):
+                    self._reject(status.HTTP_503_SERVICE_UNAVAILABLE, self.retry_after,
+                                 "Too many predictions in progress, please retry")
+                if self._user_expensive.get(uid, 0) >= self.max_expensive_per_user:
+                    self._reject(status.HTTP_429_TOO_MANY_REQUESTS, self.retry_after,
+                                 "Too many predictions in progress for this user")
+
+            wait = self._user_bucket(uid, cls).take(time.monotonic())
+            if wait > 0:
+                self._reject(status.HTTP_429_TOO_MANY_REQUESTS, wait, "Rate limit exceeded")
+
+            self._in_flight[cls] += 1
+            if cls == EXPENSIVE:
+                self._user_expensive[uid] = self._user_expensive.get(uid, 0) + 1
+
+    def release(self, uid: str, cls: str):
+        with self._lock:
+            self._in_flight[cls] -= 1
+            if cls == EXPENSIVE:
+                remaining = self._user_expensive.get(uid, 1) - 1
+                if remaining > 0:
+                    self._user_expensive[uid] = remaining
+                else:
+                    self._user_expensive.pop(uid, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": dict(self._in_flight),
+                "tracked_users": len(self._buckets),
+                "shed": dict(self.shed),
+            }
+
+
+admission = AdmissionController.from_env()
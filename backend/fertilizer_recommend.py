@@ -1,28 +1,77 @@
 import joblib
 import pandas as pd
 import os
+from fertilizer_table import FertilizerDecisionTable, TABLE_FILE, model_fingerprint
+from telemetry import telemetry
 
 class FertilizerModelPredictor:
-    def __init__(self, model_path: str = "ml_models"):
+    def __init__(self, model_path: str = "ml_models", use_table: bool = False):
         self.model_path = model_path
         self.model = None
         self.model_columns = None
+        self.use_table = use_table
+        self.table = None
+        self.model_version = None
 
     def load_model(self):
         try:
             self.model = joblib.load(os.path.join(self.model_path, "fertilizer_model.pkl"))
             self.model_columns = joblib.load(os.path.join(self.model_path, "model_columns.pkl"))
+            self.model_version = f"random-forest-{model_fingerprint(self.model_path)[:12]}"
             print("✅ Fertilizer model loaded successfully")
-            return True
         except Exception as e:
             print(f"❌ Error loading fertilizer model: {e}")
             return False
 
+        if self.use_table:
+            self.load_table()
+        return True
+
+    def load_table(self):
+        """Load the precompiled decision table; predictions fall back to the model without it"""
+        self.table = None
+        if not os.path.exists(os.path.join(self.model_path, TABLE_FILE)):
+            print("⚠️ Fertilizer table not found, using the model directly")
+            return False
+        try:
+            table = FertilizerDecisionTable.load(self.model_path)
+            if table.fingerprint != model_fingerprint(self.model_path):
+                print("⚠️ Fertilizer table is stale, recompile it with `python fertilizer_table.py compile`")
+                return False
+            self.table = table
+            print(f"✅ Fertilizer table loaded ({table.cells} cells)")
+            return True
+        except Exception as e:
+            print(f"❌ Error loading fertilizer table: {e}")
+            return False
+
     def predict(self, temperature=None, humidity=None, moisture=None, soil_type=None, crop_type=None,
                 nitrogen=None, phosphorous=None, potassium=None):
         if self.model is None or self.model_columns is None:
             raise Exception("Model not loaded")
 
+        recommended = None
+        if self.table is not None:
+            recommended = self.table.lookup(temperature, humidity, moisture, soil_type, crop_type,
+                                            nitrogen, phosphorous, potassium)
+
+        telemetry.record(
+            "fertilizer", self.model_version,
+            numeric={
+                "temperature": temperature, "humidity": humidity, "moisture": moisture,
+                "nitrogen": nitrogen, "phosphorous": phosphorous, "potassium": potassium,
+            },
+            categorical={"soil_type": soil_type, "crop_type": crop_type},
+            unknown={
+                "soil_type": bool(soil_type) and f"Soil_Type_{soil_type}" not in self.model_columns,
+                "crop_type": bool(crop_type) and f"Crop_Type_{crop_type}" not in self.model_columns,
+            },
+            flags={"table_hit": recommended is not None} if self.table is not None else None,
+        )
+
+        if recommended is not None:
+            return {"recommended_fertilizer": recommended}
+
         # Create input dataframe with same columns as training
         input_dict = {
             "Temperature": [temperature if temperature is not None else 0],
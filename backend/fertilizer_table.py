@@ -0,0 +1,409 @@
+import argparse
+import hashlib
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+
+TABLE_FILE = "fertilizer_table.pkl"
+MODEL_FILE = "fertilizer_model.pkl"
+DEFAULT_MAX_CELLS = 20_000_000
+DEFAULT_MIN_COVERAGE = 0.3
+
+# Numeric model columns in the order they index the table
+NUMERIC_FEATURES = ["Temperature", "Humidity", "Moisture", "Nitrogen", "Potassium", "Phosphorous"]
+
+# fertilizer_dataset.csv headers (typos included) -> model column names
+DATASET_COLUMNS = {
+    "Temparature": "Temperature",
+    "Humidity ": "Humidity",
+    "Moisture": "Moisture",
+    "Nitrogen": "Nitrogen",
+    "Potassium": "Potassium",
+    "Phosphorous": "Phosphorous",
+}
+
+# fertilizer_dataset.csv categorical columns
+SOIL_COLUMN = "Soil Type"
+CROP_COLUMN = "Crop Type"
+
+# FertilizerModelPredictor.predict keyword -> model column name
+PREDICT_ARGS = {
+    "temperature": "Temperature",
+    "humidity": "Humidity",
+    "moisture": "Moisture",
+    "nitrogen": "Nitrogen",
+    "potassium": "Potassium",
+    "phosphorous": "Phosphorous",
+}
+
+
+def model_fingerprint(model_path: str) -> str:
+    """SHA-256 of the fertilizer model file, used to detect stale tables"""
+    with open(os.path.join(model_path, MODEL_FILE), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_dataset(csv_path: str) -> pd.DataFrame:
+    """Training dataset with numeric columns renamed to the model's column names"""
+    return pd.read_csv(csv_path).rename(columns=DATASET_COLUMNS)
+
+
+def observed_pairs(model_columns: List[str], data: pd.DataFrame) -> List[Tuple[str, str]]:
+    """Soil/crop pairs that occur in the dataset and have one-hot columns in the model"""
+    model_columns = set(model_columns)
+    return sorted(
+        (soil, crop)
+        for soil, crop in data[[SOIL_COLUMN, CROP_COLUMN]].drop_duplicates().itertuples(index=False)
+        if f"Soil_Type_{soil}" in model_columns and f"Crop_Type_{crop}" in model_columns
+    )
+
+
+def _split_points(model, feature_index: int) -> Optional[np.ndarray]:
+    """Sorted thresholds the model uses on a feature, or None if it is not tree based"""
+    estimators = getattr(model, "estimators_", None)
+    estimators = [model] if estimators is None else np.ravel(estimators)
+
+    thresholds = []
+    for estimator in estimators:
+        tree = getattr(estimator, "tree_", None)
+        if tree is None:
+            return None
+        thresholds.append(tree.threshold[tree.feature == feature_index])
+
+    return np.unique(np.concatenate(thresholds))
+
+
+def _axis(thresholds: Optional[np.ndarray], low: int, high: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map every integer in [low, high] to a cell and pick one representative per cell.
+
+    Trees route on `x <= threshold`, so two integers fall in the same cell when no
+    split threshold lies between them and the model cannot tell them apart.
+    """
+    values = np.arange(low, high + 1)
+    if thresholds is None:
+        return np.arange(len(values)), values
+
+    keys = np.searchsorted(thresholds, values, side="left")
+    _, first, cell_of = np.unique(keys, return_index=True, return_inverse=True)
+    return cell_of.astype(np.int32), values[first]
+
+
+def _table_cells(thresholds: List[Optional[np.ndarray]], bounds: Dict[str, Tuple[int, int]],
+                 categories: int) -> int:
+    cells = categories
+    for t, col in zip(thresholds, NUMERIC_FEATURES):
+        cells *= len(_axis(t, *bounds[col])[1])
+    return cells
+
+
+def coverage(bounds: Dict[str, Tuple[int, int]], data: pd.DataFrame) -> float:
+    """Fraction of dataset rows whose numeric features all fall inside `bounds`"""
+    inside = np.ones(len(data), dtype=bool)
+    for col in NUMERIC_FEATURES:
+        low, high = bounds[col]
+        inside &= (data[col] >= low).to_numpy() & (data[col] <= high).to_numpy()
+    return float(inside.mean()) if len(data) else 0.0
+
+
+def central_bounds(model, model_columns: List[str], data: pd.DataFrame, pairs: List[Tuple[str, str]],
+                   max_cells: int = DEFAULT_MAX_CELLS,
+                   fixed: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict[str, Tuple[int, int]]:
+    """
+    Data-driven numeric domain that fits in `max_cells` for the given soil/crop pairs.
+
+    Starts from the dataset's bounding box (with `fixed` ranges taken as given) and
+    repeatedly drops one edge cell of one axis, choosing the edge that loses the
+    fewest dataset rows per unit of (log) table size saved. The box therefore
+    shrinks toward where the training data is dense.
+    """
+    model_columns = list(model_columns)
+    fixed = fixed or {}
+    bounds = {col: (int(data[col].min()), int(data[col].max())) for col in NUMERIC_FEATURES}
+    bounds.update(fixed)
+
+    thresholds = [_split_points(model, model_columns.index(col)) for col in NUMERIC_FEATURES]
+    cells = _table_cells(thresholds, bounds, len(pairs))
+    rows = len(data)
+
+    while cells > max_cells:
+        kept = coverage(bounds, data) * rows
+        best = None
+        for t, col in zip(thresholds, NUMERIC_FEATURES):
+            low, high = bounds[col]
+            if col in fixed or low == high:
+                continue
+            cell_of, _ = _axis(t, low, high)
+            # Number of integers in the first / last cell of the axis
+            head = int(np.argmax(cell_of != cell_of[0])) or len(cell_of)
+            tail = int(np.argmax(cell_of[::-1] != cell_of[-1])) or len(cell_of)
+            for candidate in ((low + head, high), (low, high - tail)):
+                if candidate[0] > candidate[1]:
+                    continue
+                trial = dict(bounds)
+                trial[col] = candidate
+                trial_cells = _table_cells(thresholds, trial, len(pairs))
+                lost = kept - coverage(trial, data) * rows
+                score = (lost + 1e-3) / math.log(cells / trial_cells)
+                if best is None or score < best[0]:
+                    best = (score, trial, trial_cells)
+        if best is None:
+            raise ValueError(f"Cannot fit the fixed ranges {fixed} into max_cells={max_cells}")
+        _, bounds, cells = best
+
+    return bounds
+
+
+def batch_frame(model_columns: List[str], numeric: np.ndarray,
+                soil_type: Optional[str], crop_type: Optional[str]) -> pd.DataFrame:
+    """Build model input rows the same way FertilizerModelPredictor.predict does"""
+    df = pd.DataFrame(0, index=np.arange(len(numeric)), columns=model_columns)
+    for i, col in enumerate(NUMERIC_FEATURES):
+        df[col] = numeric[:, i]
+    if soil_type and f"Soil_Type_{soil_type}" in df.columns:
+        df[f"Soil_Type_{soil_type}"] = 1
+    if crop_type and f"Crop_Type_{crop_type}" in df.columns:
+        df[f"Crop_Type_{crop_type}"] = 1
+    return df
+
+
+class FertilizerDecisionTable:
+    """
+    Precomputed fertilizer recommendations over a bounded integer input domain.
+
+    The table holds the soil/crop pairs seen in the training data, and its numeric
+    axes are compressed to the cells the model can distinguish, so a lookup is a
+    handful of array indexes. Other inputs (unseen or missing soil/crop pairs,
+    non-integers, out-of-range values) return None and the caller falls back to
+    the model.
+    """
+
+    def __init__(self, model_columns: List[str], classes: np.ndarray,
+                 bounds: Dict[str, Tuple[int, int]], cell_maps: List[np.ndarray],
+                 pairs: List[Tuple[str, str]], codes: np.ndarray, fingerprint: str):
+        self.model_columns = list(model_columns)
+        self.classes = classes
+        self.bounds = bounds
+        self.cell_maps = cell_maps
+        self.pairs = [tuple(pair) for pair in pairs]
+        self.codes = codes
+        self.fingerprint = fingerprint
+        self._pair_index = {pair: i for i, pair in enumerate(self.pairs)}
+
+    @property
+    def cells(self) -> int:
+        return int(self.codes.size)
+
+    @classmethod
+    def compile(cls, model, model_columns: List[str], bounds: Dict[str, Tuple[int, int]],
+                pairs: List[Tuple[str, str]], fingerprint: str,
+                max_cells: int = DEFAULT_MAX_CELLS) -> "FertilizerDecisionTable":
+        """Evaluate the model once per distinguishable cell of the domain, for each soil/crop pair"""
+        model_columns = list(model_columns)
+        cell_maps, representatives = [], []
+        for col in NUMERIC_FEATURES:
+            low, high = bounds[col]
+            cell_of, reps = _axis(_split_points(model, model_columns.index(col)), low, high)
+            cell_maps.append(cell_of)
+            representatives.append(reps)
+
+        shape = (len(pairs),) + tuple(len(r) for r in representatives)
+        cells = int(np.prod(shape, dtype=np.int64))
+        if cells > max_cells:
+            raise ValueError(
+                f"Table would have {cells} cells (shape {shape}), more than max_cells={max_cells}. "
+                f"Narrow the feature ranges or raise the limit."
+            )
+
+        classes = np.asarray(model.classes_)
+        dtype = np.uint8 if len(classes) <= np.iinfo(np.uint8).max else np.uint16
+        codes = np.empty(shape, dtype=dtype)
+
+        grid = np.stack(np.meshgrid(*representatives, indexing="ij"), axis=-1).reshape(-1, len(NUMERIC_FEATURES))
+        class_index = pd.Index(classes)
+        for p, (soil_type, crop_type) in enumerate(pairs):
+            predictions = model.predict(batch_frame(model_columns, grid, soil_type, crop_type))
+            codes[p] = class_index.get_indexer(predictions).reshape(shape[1:])
+
+        return cls(model_columns, classes, bounds, cell_maps, pairs, codes, fingerprint)
+
+    def _cell(self, col_index: int, value) -> Optional[int]:
+        value = 0 if value is None else value
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        if not value.is_integer():
+            return None
+        low, high = self.bounds[NUMERIC_FEATURES[col_index]]
+        if value < low or value > high:
+            return None
+        return int(self.cell_maps[col_index][int(value) - low])
+
+    def lookup(self, temperature=None, humidity=None, moisture=None, soil_type=None, crop_type=None,
+               nitrogen=None, phosphorous=None, potassium=None):
+        """Return the recommended fertilizer, or None if the inputs are outside the table"""
+        inputs = {
+            "temperature": temperature,
+            "humidity": humidity,
+            "moisture": moisture,
+            "nitrogen": nitrogen,
+            "potassium": potassium,
+            "phosphorous": phosphorous,
+        }
+        pair = self._pair_index.get((soil_type, crop_type))
+        if pair is None:
+            return None
+        index = [pair]
+        for i, name in enumerate(PREDICT_ARGS):
+            cell = self._cell(i, inputs[name])
+            if cell is None:
+                return None
+            index.append(cell)
+
+        return self.classes[self.codes[tuple(index)]]
+
+    def save(self, model_path: str) -> str:
+        path = os.path.join(model_path, TABLE_FILE)
+        joblib.dump({
+            "model_columns": self.model_columns,
+            "classes": self.classes,
+            "bounds": self.bounds,
+            "cell_maps": self.cell_maps,
+            "pairs": self.pairs,
+            "codes": self.codes,
+            "fingerprint": self.fingerprint,
+        }, path, compress=3)
+        return path
+
+    @classmethod
+    def load(cls, model_path: str) -> "FertilizerDecisionTable":
+        data = joblib.load(os.path.join(model_path, TABLE_FILE))
+        return cls(**data)
+
+
+def _grid_chunks(axes: List[np.ndarray], max_rows: int):
+    """
+    Yield the Cartesian product of `axes` as (rows, len(axes)) blocks of at most
+    `max_rows` rows (or one innermost axis, if that is longer).
+    """
+    split = len(axes) - 1
+    while split > 0 and np.prod([len(a) for a in axes[split - 1:]], dtype=np.int64) <= max_rows:
+        split -= 1
+    inner = np.stack(np.meshgrid(*axes[split:], indexing="ij"), axis=-1).reshape(-1, len(axes) - split)
+    for outer in np.ndindex(*[len(a) for a in axes[:split]]):
+        prefix = np.array([axes[k][i] for k, i in enumerate(outer)], dtype=inner.dtype)
+        yield np.hstack([np.broadcast_to(prefix, (len(inner), split)), inner])
+
+
+def verify(predictor, table: FertilizerDecisionTable, samples: Optional[int] = None,
+           seed: int = 0, chunk_rows: int = 200_000) -> int:
+    """
+    Compare table lookups with model predictions and return the number of mismatches.
+
+    By default every integer point of the compiled domain is checked for every
+    soil/crop pair in the table, walking the grid in blocks of `chunk_rows` so memory
+    stays bounded; a zero result proves the table matches the model exactly.
+    `samples` checks that many random points instead. A few points also go through
+    the predictor's own single-row predict path.
+    """
+    model, model_columns = predictor.model, predictor.model_columns
+    axes = [np.arange(low, high + 1) for low, high in (table.bounds[col] for col in NUMERIC_FEATURES)]
+    rng = np.random.default_rng(seed)
+
+    if samples is None:
+        chunks = _grid_chunks(axes, chunk_rows)
+    else:
+        chunks = [np.stack([rng.choice(axis, size=samples) for axis in axes], axis=-1)]
+
+    mismatches = 0
+    points = None
+    for points in chunks:
+        cells = tuple(
+            table.cell_maps[i][points[:, i] - table.bounds[col][0]] for i, col in enumerate(NUMERIC_FEATURES)
+        )
+        for p, (soil_type, crop_type) in enumerate(table.pairs):
+            expected = model.predict(batch_frame(model_columns, points, soil_type, crop_type))
+            mismatches += int(np.count_nonzero(table.classes[table.codes[p][cells]] != expected))
+
+    for row in points[:100]:
+        kwargs = dict(zip(PREDICT_ARGS, row.tolist()))
+        soil_type, crop_type = table.pairs[rng.integers(len(table.pairs))]
+        expected = predictor.predict(soil_type=soil_type, crop_type=crop_type, **kwargs)
+        if table.lookup(soil_type=soil_type, crop_type=crop_type, **kwargs) != expected["recommended_fertilizer"]:
+            mismatches += 1
+
+    return mismatches
+
+
+def _parse_range(value: str) -> Tuple[str, Tuple[int, int]]:
+    name, _, span = value.partition("=")
+    low, _, high = span.partition(":")
+    if name not in NUMERIC_FEATURES or not low or not high:
+        raise argparse.ArgumentTypeError(f"expected FEATURE=LOW:HIGH with FEATURE in {NUMERIC_FEATURES}")
+    return name, (int(low), int(high))
+
+
+def main():
+    from fertilizer_recommend import FertilizerModelPredictor
+
+    parser = argparse.ArgumentParser(description="Compile or verify the fertilizer decision table")
+    parser.add_argument("command", choices=["compile", "verify"])
+    parser.add_argument("--model-path", default="ml_models")
+    parser.add_argument("--dataset", default="fertilizer_dataset.csv",
+                        help="training data the default feature ranges are centred on")
+    parser.add_argument("--range", dest="ranges", action="append", type=_parse_range, default=[],
+                        help="pin a feature range instead of choosing it from the data, e.g. --range Moisture=30:50")
+    parser.add_argument("--max-cells", type=int, default=DEFAULT_MAX_CELLS)
+    parser.add_argument("--min-coverage", type=float, default=DEFAULT_MIN_COVERAGE,
+                        help="fail if the table covers a smaller share of the dataset rows")
+    parser.add_argument("--samples", type=int,
+                        help="verify this many random points instead of the whole domain")
+    args = parser.parse_args()
+
+    predictor = FertilizerModelPredictor(model_path=args.model_path)
+    if not predictor.load_model():
+        raise SystemExit(1)
+
+    if args.command == "compile":
+        data = load_dataset(args.dataset)
+        pairs = observed_pairs(predictor.model_columns, data)
+        try:
+            bounds = central_bounds(predictor.model, predictor.model_columns, data, pairs,
+                                    max_cells=args.max_cells, fixed=dict(args.ranges))
+        except ValueError as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+        covered = coverage(bounds, data)
+        print(f"{len(pairs)} soil/crop pairs, covers {covered:.0%} of the rows in {args.dataset}")
+        for col in NUMERIC_FEATURES:
+            print(f"- {col}: {bounds[col][0]}..{bounds[col][1]}")
+        if covered < args.min_coverage:
+            print(f"❌ Coverage is below --min-coverage={args.min_coverage:.0%}, most requests would "
+                  f"fall back to the model. Raise --max-cells or pin ranges with --range.")
+            raise SystemExit(1)
+        table = FertilizerDecisionTable.compile(
+            predictor.model, predictor.model_columns, bounds, pairs,
+            model_fingerprint(args.model_path), max_cells=args.max_cells,
+        )
+        path = table.save(args.model_path)
+        print(f"✅ Fertilizer table with {table.cells} cells saved to {path}")
+        return
+
+    table = FertilizerDecisionTable.load(args.model_path)
+    if table.fingerprint != model_fingerprint(args.model_path):
+        print("❌ Fertilizer table was compiled from a different model, recompile it")
+        raise SystemExit(1)
+    mismatches = verify(predictor, table, samples=args.samples)
+    if mismatches:
+        print(f"❌ {mismatches} table entries disagree with the model")
+        raise SystemExit(1)
+    print("✅ Fertilizer table matches the model")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.exception_handlers import request_validation_exception_handler
 import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from firebase_admin import credentials, auth
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -15,6 +15,10 @@ import requests
 import uuid
 from model_utils import predictor
 from fertilizer_recommend import FertilizerModelPredictor
+from admission import admission, CHEAP, EXPENSIVE
+from telemetry import telemetry
+from summaries import summary_crop, summary_from_predictions, summary_response
+from storage import create_storage
 import logging
 
 load_dotenv()
@@ -41,11 +45,14 @@ if not firebase_admin._apps:
         print(f"⚠️ Firebase initialization failed: {e}")
         print("Please add your firebase-service-account.json file")
 
-db = firestore.client()
+storage = create_storage()
 security = HTTPBearer()
 
 # Instantiate fertilizer model predictor globally
-fertilizer_predictor = FertilizerModelPredictor(model_path="ml_models")
+fertilizer_predictor = FertilizerModelPredictor(
+    model_path="ml_models",
+    use_table=os.getenv("FERTILIZER_TABLE", "false").lower() == "true",
+)
 fertilizer_load_success = fertilizer_predictor.load_model()
 
 @app.exception_handler(RequestValidationError)
@@ -72,6 +79,8 @@ async def startup_event():
     else:
         print("⚠️ Fertilizer model failed to load")
 
+    telemetry.load_training_stats("ml_models")
+
 class PredictionRequest(BaseModel):
     farm_id: str
     crop: str
@@ -113,6 +122,26 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+def admit(request_class: str):
+    """
+    Dependency that authenticates the user and holds an admission slot for the request.
+
+    Guarded handlers are plain `def` functions so FastAPI runs them in its threadpool;
+    the slot is taken on the event loop before that, so requests waiting for a worker
+    thread count against the in-flight limits and overload is shed up front.
+    """
+    async def dependency(user=Depends(get_current_user)):
+        admission.acquire(user["uid"], request_class)
+        try:
+            yield user
+        finally:
+            admission.release(user["uid"], request_class)
+    return dependency
+
+# Current conditions from OpenWeatherMap (the optional OPENWEATHER_API_KEY integration
+# in the README). Not used for /api/predict: its rainfall is the last hour's rain, not
+# the annual figure the yield model was trained on. It is kept for the day a farm's
+# annual rainfall can be derived from it.
 def get_weather_data(lat: float, lon: float) -> Dict[str, float]:
     api_key = os.getenv("OPENWEATHER_API_KEY")
     if not api_key:
@@ -120,7 +149,7 @@ def get_weather_data(lat: float, lon: float) -> Dict[str, float]:
     
     try:
         url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-        response = requests.get(url)
+        response = requests.get(url, timeout=10)
         data = response.json()
         return {
             "temperature": data["main"]["temp"],
@@ -146,8 +175,18 @@ async def get_available_crops():
         raise HTTPException(status_code=503, detail="ML model not available")
     return {"crops": predictor.get_available_crops()}
 
+@app.get("/api/telemetry")
+def get_telemetry(user=Depends(admit(CHEAP))):
+    # Operators only: grant with auth.set_custom_user_claims(uid, {"admin": True})
+    if user.get("admin") is not True:
+        raise HTTPException(status_code=403, detail="Operator access required")
+    report = telemetry.report()
+    report["storage"] = storage.timings()
+    report["admission"] = admission.stats()
+    return report
+
 @app.post("/api/predict")
-async def predict_yield(request: PredictionRequest, user=Depends(get_current_user)):
+def predict_yield(request: PredictionRequest, user=Depends(admit(EXPENSIVE))):
     if not predictor.is_loaded:
         raise HTTPException(status_code=503, detail="ML model not available")
 
@@ -157,28 +196,20 @@ async def predict_yield(request: PredictionRequest, user=Depends(get_current_use
 
         logger.info(f"Starting prediction for user {user_id} with request id {request_id} and inputs: {request}")
 
-        prediction_ref = db.collection("users").document(user_id).collection("predictions").document(request_id)
-        prediction_ref.set({
+        created_at = datetime.utcnow()
+        storage.create_prediction(user_id, request_id, {
             "farm_id": request.farm_id,
             "inputs": request.dict(),
             "status": "pending",
-            "created_at": datetime.utcnow(),
+            "created_at": created_at,
         })
+        prediction_created = True
 
         rainfall = request.rainfall
         if rainfall is None:
-            try:
-                farm_ref = db.collection("users").document(user_id).collection("farms").document(request.farm_id)
-                farm_doc = farm_ref.get()
-                if farm_doc.exists():
-                    farm_data = farm_doc.to_dict()
-                    weather = get_weather_data(farm_data["location"]["lat"], farm_data["location"]["lon"])
-                    rainfall = weather["rainfall"]
-                else:
-                    rainfall = 100.0
-            except Exception as e:
-                logger.error(f"Error getting weather data: {e}")
-                rainfall = 100.0
+            # The model expects annual rainfall; get_weather_data only has the last
+            # hour's rain, so it is not a usable stand-in and the default is used
+            rainfall = 100.0
 
         prediction_result = predictor.predict_yield(
             crop=request.crop,
@@ -227,11 +258,22 @@ async def predict_yield(request: PredictionRequest, user=Depends(get_current_use
         if fertilizer_result is not None:
             result["fertilizer_recommendation"] = fertilizer_result
 
-        prediction_ref.update({
-            "outputs": result,
-            "status": "complete",
-            "completed_at": datetime.utcnow(),
-        })
+        # Summary keys are bounded: unknown crops share one bucket and farms the
+        # user does not own get no by_farm entry
+        owned_farm = storage.get_farm(user_id, request.farm_id) is not None
+        storage.complete_prediction(
+            user_id,
+            request_id,
+            {
+                "outputs": result,
+                "status": "complete",
+                "completed_at": datetime.utcnow(),
+            },
+            farm_id=request.farm_id if owned_farm else None,
+            crop=summary_crop(request.crop, predictor.get_available_crops()),
+            predicted_yield=result["predicted_yield_kg_per_ha"],
+            created_at=created_at,
+        )
 
         logger.info(f"Prediction completed successfully for request id {request_id}")
 
@@ -239,8 +281,8 @@ async def predict_yield(request: PredictionRequest, user=Depends(get_current_use
 
     except Exception as e:
         logger.error(f"Prediction failed: {e}")
-        if 'prediction_ref' in locals():
-            prediction_ref.update({
+        if 'prediction_created' in locals():
+            storage.update_prediction(user_id, request_id, {
                 "status": "error",
                 "error": str(e),
                 "completed_at": datetime.utcnow(),
@@ -248,7 +290,7 @@ async def predict_yield(request: PredictionRequest, user=Depends(get_current_use
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 @app.post("/api/add-farm")
-async def add_farm(farm: FarmData, user=Depends(get_current_user)):
+def add_farm(farm: FarmData, user=Depends(admit(CHEAP))):
     try:
         user_id = user["uid"]
         farm_id = str(uuid.uuid4())
@@ -262,7 +304,7 @@ async def add_farm(farm: FarmData, user=Depends(get_current_user)):
             "created_at": datetime.utcnow(),
         }
 
-        db.collection("users").document(user_id).collection("farms").document(farm_id).set(farm_data)
+        storage.add_farm(user_id, farm_id, farm_data)
 
         return {"farm_id": farm_id, "message": "Farm added successfully"}
 
@@ -270,31 +312,53 @@ async def add_farm(farm: FarmData, user=Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Failed to add farm: {str(e)}")
 
 @app.get("/api/get-farms")
-async def get_farms(user=Depends(get_current_user)):
+def get_farms(user=Depends(admit(CHEAP))):
     try:
         user_id = user["uid"]
         logger.info(f"Fetching farms for user {user_id}")
-        farms_ref = db.collection("users").document(user_id).collection("farms")
-        farms = [doc.to_dict() for doc in farms_ref.stream()]
+        farms = storage.list_farms(user_id)
         return {"farms": farms}
     except Exception as e:
         logger.error(f"Failed to get farms: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get farms: {str(e)}")
 
 @app.get("/api/get-predictions")
-async def get_predictions(user=Depends(get_current_user)):
+def get_predictions(user=Depends(admit(CHEAP))):
     try:
         user_id = user["uid"]
-        predictions_ref = db.collection("users").document(user_id).collection("predictions")
-        predictions = []
-        for doc in predictions_ref.order_by("created_at", direction=firestore.Query.DESCENDING).stream():
-            predictions.append(doc.to_dict())
+        predictions = storage.list_predictions(user_id)
         return {"predictions": predictions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get predictions: {str(e)}")
 
+@app.get("/api/summary")
+def get_summary(user=Depends(admit(CHEAP))):
+    try:
+        user_id = user["uid"]
+        summary = storage.get_prediction_summary(user_id)
+        if not summary or not summary.get("backfilled"):
+            # History from before summaries existed has not been folded in yet
+            if not predictor.is_loaded:
+                raise HTTPException(status_code=503, detail="ML model not available")
+            logger.info(f"Rebuilding prediction summary for user {user_id}")
+            crops = set(predictor.get_available_crops())
+            farm_ids = {farm["farm_id"] for farm in storage.list_farms(user_id)}
+            summary = storage.backfill_prediction_summary(
+                user_id, lambda predictions: summary_from_predictions(predictions, crops, farm_ids)
+            )
+
+        return {
+            "summary": summary_response(summary),
+            "recent_predictions": storage.list_predictions(user_id, limit=3),
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to get summary: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get summary: {str(e)}")
+
 @app.post("/api/update-profile")
-async def update_profile(profile: UserProfile, user=Depends(get_current_user)):
+def update_profile(profile: UserProfile, user=Depends(admit(CHEAP))):
     try:
         user_id = user["uid"]
 
@@ -306,7 +370,7 @@ async def update_profile(profile: UserProfile, user=Depends(get_current_user)):
             "updated_at": datetime.utcnow(),
         }
 
-        db.collection("users").document(user_id).set(profile_data, merge=True)
+        storage.update_profile(user_id, profile_data)
 
         return {"message": "Profile updated successfully"}
 
@@ -1,8 +1,10 @@
+import hashlib
 import joblib
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Optional, Tuple
 import os
+from telemetry import telemetry
 
 class CropYieldPredictor:
     def __init__(self, model_path: str = "ml_models"):
@@ -12,6 +14,7 @@ class CropYieldPredictor:
         self.feature_names = None
         self.crop_mapping = None
         self.is_loaded = False
+        self.model_version = None
         
     def load_model(self) -> bool:
         """Load the trained model and associated artifacts"""
@@ -27,6 +30,8 @@ class CropYieldPredictor:
             
             self.model = joblib.load(model_file)
             self.label_encoder = joblib.load(encoder_file)
+            with open(model_file, "rb") as f:
+                self.model_version = f"catboost-{hashlib.sha256(f.read()).hexdigest()[:12]}"
             
             # Load optional files
             if os.path.exists(features_file):
@@ -88,6 +93,13 @@ class CropYieldPredictor:
         try:
             # Encode crop
             crop_encoded = self.encode_crop(crop)
+
+            telemetry.record(
+                "yield", self.model_version,
+                numeric={"area": area, "rainfall": rainfall, "fertilizer": fertilizer, "pesticide": pesticide},
+                categorical={"crop": crop},
+                unknown={"crop": crop not in self.label_encoder.classes_},
+            )
             
             # Prepare features array
             features = np.array([[
@@ -124,7 +136,7 @@ class CropYieldPredictor:
                 "predicted_yield": float(predicted_yield),
                 "confidence_interval": confidence_interval,
                 "feature_importance": feature_importance,
-                "model_version": "catboost-v1",
+                "model_version": self.model_version,
                 "crop_encoded": crop_encoded,
                 "input_features": {
                     "crop": crop,
@@ -0,0 +1,471 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from summaries import PREDICTION_SUMMARY_DOC, summary_update
+from telemetry import QuantileSketch
+
+
+class Storage(ABC):
+    """Persistence for user profiles, farms, predictions and prediction summaries"""
+
+    name = "storage"
+
+    @abstractmethod
+    def get_profile(self, uid: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def update_profile(self, uid: str, data: Dict):
+        """Merge `data` into the user's profile, creating it if needed"""
+
+    @abstractmethod
+    def add_farm(self, uid: str, farm_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    def get_farm(self, uid: str, farm_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def list_farms(self, uid: str) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def create_prediction(self, uid: str, request_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    def update_prediction(self, uid: str, request_id: str, fields: Dict):
+        """Overwrite the given top-level fields of a stored prediction"""
+
+    @abstractmethod
+    def list_predictions(self, uid: str, limit: Optional[int] = None) -> List[Dict]:
+        """Predictions newest first"""
+
+    @abstractmethod
+    def get_prediction_summary(self, uid: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def backfill_prediction_summary(self, uid: str, build: Callable[[Iterable[Dict]], Dict]) -> Dict:
+        """
+        Replace the summary with `build(predictions)` unless it is already backfilled.
+
+        The summary read, the predictions read and the write happen in one transaction,
+        so concurrent backfills and completing predictions are neither lost nor counted twice.
+        """
+
+    @abstractmethod
+    def complete_prediction(self, uid: str, request_id: str, fields: Dict, farm_id: Optional[str],
+                            crop: str, predicted_yield: float, created_at: datetime):
+        """
+        Overwrite the given fields of a prediction and fold it into the summary in one
+        atomic write, without reading the summary first (see summary_update)
+        """
+
+
+class FirestoreStorage(Storage):
+    """
+    users/{uid} documents with farms, predictions and summaries subcollections.
+
+    firebase_admin is imported where it is used, so the SQLite backend and the
+    benchmark run without it installed.
+    """
+
+    name = "firestore"
+
+    def __init__(self, db):
+        self.db = db
+
+    def _user(self, uid: str):
+        return self.db.collection("users").document(uid)
+
+    def get_profile(self, uid: str) -> Optional[Dict]:
+        doc = self._user(uid).get()
+        return doc.to_dict() if doc.exists else None
+
+    def update_profile(self, uid: str, data: Dict):
+        self._user(uid).set(data, merge=True)
+
+    def add_farm(self, uid: str, farm_id: str, data: Dict):
+        self._user(uid).collection("farms").document(farm_id).set(data)
+
+    def get_farm(self, uid: str, farm_id: str) -> Optional[Dict]:
+        doc = self._user(uid).collection("farms").document(farm_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def list_farms(self, uid: str) -> List[Dict]:
+        return [doc.to_dict() for doc in self._user(uid).collection("farms").stream()]
+
+    def create_prediction(self, uid: str, request_id: str, data: Dict):
+        self._user(uid).collection("predictions").document(request_id).set(data)
+
+    def update_prediction(self, uid: str, request_id: str, fields: Dict):
+        self._user(uid).collection("predictions").document(request_id).update(fields)
+
+    def list_predictions(self, uid: str, limit: Optional[int] = None) -> List[Dict]:
+        from firebase_admin import firestore
+
+        query = self._user(uid).collection("predictions").order_by(
+            "created_at", direction=firestore.Query.DESCENDING
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        return [doc.to_dict() for doc in query.stream()]
+
+    def _summary(self, uid: str):
+        return self._user(uid).collection("summaries").document(PREDICTION_SUMMARY_DOC)
+
+    def get_prediction_summary(self, uid: str) -> Optional[Dict]:
+        doc = self._summary(uid).get()
+        return doc.to_dict() if doc.exists else None
+
+    def backfill_prediction_summary(self, uid: str, build: Callable[[Iterable[Dict]], Dict]) -> Dict:
+        from firebase_admin import firestore
+
+        summary_ref = self._summary(uid)
+        predictions = self._user(uid).collection("predictions")
+
+        @firestore.transactional
+        def backfill(transaction):
+            snapshot = summary_ref.get(transaction=transaction)
+            current = snapshot.to_dict() if snapshot.exists else None
+            if current and current.get("backfilled"):
+                return current
+            summary = build(doc.to_dict() for doc in predictions.stream(transaction=transaction))
+            transaction.set(summary_ref, summary)
+            return summary
+
+        return backfill(self.db.transaction())
+
+    def complete_prediction(self, uid: str, request_id: str, fields: Dict, farm_id: Optional[str],
+                            crop: str, predicted_yield: float, created_at: datetime):
+        batch = self.db.batch()
+        batch.update(self._user(uid).collection("predictions").document(request_id), fields)
+        batch.set(
+            self._summary(uid),
+            summary_update(request_id, farm_id, crop, predicted_yield, created_at),
+            merge=True,
+        )
+        batch.commit()
+
+
+# Document fields stored as ISO strings in SQLite and turned back into datetimes on read
+_TIMESTAMP_FIELDS = {"created_at", "completed_at", "updated_at"}
+
+
+def _utc(value: datetime) -> datetime:
+    """
+    Timezone-aware UTC datetime, like the ones Firestore returns, so both backends
+    serialize timestamps with a +00:00 offset. Naive values (datetime.utcnow(),
+    rows written before offsets were stored) are taken to be UTC already.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _encode(value) -> str:
+    return json.dumps(value, default=lambda v: _utc(v).isoformat() if isinstance(v, datetime) else str(v))
+
+
+def _decode_timestamps(obj: Dict) -> Dict:
+    for key in _TIMESTAMP_FIELDS & obj.keys():
+        if isinstance(obj[key], str):
+            try:
+                obj[key] = _utc(datetime.fromisoformat(obj[key]))
+            except ValueError:
+                pass
+    return obj
+
+
+def _decode(text: Optional[str]):
+    return None if text is None else json.loads(text, object_hook=_decode_timestamps)
+
+
+def _iso(value) -> str:
+    """Fixed-width UTC ISO string for indexed columns, so they sort chronologically"""
+    return _utc(value).isoformat(timespec="microseconds") if isinstance(value, datetime) else str(value)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    uid TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS farms (
+    uid TEXT NOT NULL,
+    farm_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (uid, farm_id)
+);
+CREATE INDEX IF NOT EXISTS farms_uid_created_at ON farms (uid, created_at);
+CREATE TABLE IF NOT EXISTS predictions (
+    uid TEXT NOT NULL,
+    request_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (uid, request_id)
+);
+CREATE INDEX IF NOT EXISTS predictions_uid_created_at ON predictions (uid, created_at);
+CREATE TABLE IF NOT EXISTS prediction_summaries (
+    uid TEXT PRIMARY KEY,
+    latest TEXT,
+    backfilled INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prediction_stats (
+    uid TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (uid, scope, key)
+);
+"""
+
+# prediction_stats scopes; the "all" row holds the user's totals under key ""
+_SCOPES = {"crop": "by_crop", "farm": "by_farm"}
+
+_UPSERT_STATS = """
+INSERT INTO prediction_stats (uid, scope, key, count, sum, min, max) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (uid, scope, key) DO UPDATE SET
+    count = count + excluded.count,
+    sum = sum + excluded.sum,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max)
+"""
+
+
+class SQLiteStorage(Storage):
+    """
+    Single-file storage for edge/single-node deployments and offline benchmarking.
+
+    Runs in WAL mode so reads do not block the writer. Documents are stored as
+    JSON next to indexed uid/created_at columns, and summary stats are kept in
+    their own table so they can be updated with a single UPSERT.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "agrobot.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def _immediate(self):
+        """Connection inside a BEGIN IMMEDIATE transaction, committed on success"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _merge(conn, table: str, key_sql: str, key: tuple, fields: Dict):
+        """Read-modify-write a JSON document inside the caller's transaction"""
+        row = conn.execute(f"SELECT data FROM {table} WHERE {key_sql}", key).fetchone()
+        if row is None:
+            raise KeyError(f"{table} document {key} not found")
+        data = _decode(row[0])
+        data.update(fields)
+        conn.execute(f"UPDATE {table} SET data = ? WHERE {key_sql}", (_encode(data),) + key)
+
+    def get_profile(self, uid: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM profiles WHERE uid = ?", (uid,))
+        return _decode(rows[0][0]) if rows else None
+
+    def update_profile(self, uid: str, data: Dict):
+        with self._immediate() as conn:
+            row = conn.execute("SELECT data FROM profiles WHERE uid = ?", (uid,)).fetchone()
+            profile = _decode(row[0]) if row else {}
+            profile.update(data)
+            conn.execute(
+                "INSERT INTO profiles (uid, data) VALUES (?, ?) "
+                "ON CONFLICT (uid) DO UPDATE SET data = excluded.data",
+                (uid, _encode(profile)),
+            )
+
+    def add_farm(self, uid: str, farm_id: str, data: Dict):
+        self._query(
+            "INSERT OR REPLACE INTO farms (uid, farm_id, created_at, data) VALUES (?, ?, ?, ?)",
+            (uid, farm_id, _iso(data.get("created_at", datetime.now(timezone.utc))), _encode(data)),
+        )
+
+    def get_farm(self, uid: str, farm_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM farms WHERE uid = ? AND farm_id = ?", (uid, farm_id))
+        return _decode(rows[0][0]) if rows else None
+
+    def list_farms(self, uid: str) -> List[Dict]:
+        rows = self._query("SELECT data FROM farms WHERE uid = ? ORDER BY created_at", (uid,))
+        return [_decode(row[0]) for row in rows]
+
+    def create_prediction(self, uid: str, request_id: str, data: Dict):
+        self._query(
+            "INSERT OR REPLACE INTO predictions (uid, request_id, created_at, data) VALUES (?, ?, ?, ?)",
+            (uid, request_id, _iso(data.get("created_at", datetime.now(timezone.utc))), _encode(data)),
+        )
+
+    def update_prediction(self, uid: str, request_id: str, fields: Dict):
+        with self._immediate() as conn:
+            self._merge(conn, "predictions", "uid = ? AND request_id = ?", (uid, request_id), fields)
+
+    def list_predictions(self, uid: str, limit: Optional[int] = None) -> List[Dict]:
+        rows = self._query(
+            "SELECT data FROM predictions WHERE uid = ? ORDER BY created_at DESC LIMIT ?",
+            (uid, -1 if limit is None else limit),
+        )
+        return [_decode(row[0]) for row in rows]
+
+    @staticmethod
+    def _read_summary(conn, uid: str) -> Optional[Dict]:
+        row = conn.execute(
+            "SELECT latest, backfilled, updated_at FROM prediction_summaries WHERE uid = ?", (uid,)
+        ).fetchone()
+        if row is None:
+            return None
+        latest, backfilled, updated_at = row
+        summary: Dict = {
+            "by_crop": {},
+            "by_farm": {},
+            "latest": _decode(latest),
+            "backfilled": bool(backfilled),
+            "updated_at": _utc(datetime.fromisoformat(updated_at)),
+        }
+        for scope, key, count, total, low, high in conn.execute(
+            "SELECT scope, key, count, sum, min, max FROM prediction_stats WHERE uid = ?", (uid,)
+        ):
+            stats = {"count": count, "sum": total, "min": low, "max": high}
+            if scope == "all":
+                summary.update(stats)
+            else:
+                summary[_SCOPES[scope]][key] = stats
+        return summary
+
+    def get_prediction_summary(self, uid: str) -> Optional[Dict]:
+        with self._lock:
+            return self._read_summary(self._conn, uid)
+
+    def backfill_prediction_summary(self, uid: str, build: Callable[[Iterable[Dict]], Dict]) -> Dict:
+        with self._immediate() as conn:
+            current = self._read_summary(conn, uid)
+            if current and current["backfilled"]:
+                return current
+            rows = conn.execute(
+                "SELECT data FROM predictions WHERE uid = ? ORDER BY created_at DESC", (uid,)
+            ).fetchall()
+            summary = build(_decode(row[0]) for row in rows)
+
+            conn.execute("DELETE FROM prediction_stats WHERE uid = ?", (uid,))
+            if summary.get("count"):
+                conn.execute(_UPSERT_STATS, (uid, "all", "", summary["count"], summary["sum"],
+                                             summary["min"], summary["max"]))
+            for scope, field in _SCOPES.items():
+                for key, stats in (summary.get(field) or {}).items():
+                    conn.execute(_UPSERT_STATS, (uid, scope, key, stats["count"], stats["sum"],
+                                                 stats["min"], stats["max"]))
+            conn.execute(
+                "INSERT OR REPLACE INTO prediction_summaries (uid, latest, backfilled, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (uid, _encode(summary.get("latest")), int(bool(summary.get("backfilled"))),
+                 _iso(summary.get("updated_at", datetime.now(timezone.utc)))),
+            )
+            return summary
+
+    def complete_prediction(self, uid: str, request_id: str, fields: Dict, farm_id: Optional[str],
+                            crop: str, predicted_yield: float, created_at: datetime):
+        latest = {
+            "request_id": request_id,
+            "farm_id": farm_id,
+            "crop": crop,
+            "predicted_yield_kg_per_ha": predicted_yield,
+            "created_at": created_at,
+        }
+        stats = (1, predicted_yield, predicted_yield, predicted_yield)
+        with self._immediate() as conn:
+            self._merge(conn, "predictions", "uid = ? AND request_id = ?", (uid, request_id), fields)
+            conn.execute(_UPSERT_STATS, (uid, "all", "") + stats)
+            conn.execute(_UPSERT_STATS, (uid, "crop", crop) + stats)
+            if farm_id is not None:
+                conn.execute(_UPSERT_STATS, (uid, "farm", farm_id) + stats)
+            conn.execute(
+                "INSERT INTO prediction_summaries (uid, latest, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (uid) DO UPDATE SET latest = excluded.latest, updated_at = excluded.updated_at",
+                (uid, _encode(latest), _iso(datetime.now(timezone.utc))),
+            )
+
+
+class TimedStorage:
+    """Wraps a Storage and keeps a latency sketch per operation for backend comparisons"""
+
+    def __init__(self, inner: Storage):
+        self.inner = inner
+        self.name = inner.name
+        self._lock = threading.Lock()
+        self._latency: Dict[str, QuantileSketch] = {}
+
+    def __getattr__(self, attr):
+        method = getattr(self.inner, attr)
+        if attr.startswith("_") or not callable(method):
+            return method
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    self._latency.setdefault(attr, QuantileSketch()).add(elapsed_ms)
+
+        return timed
+
+    def timings(self) -> Dict:
+        """Latency in milliseconds per storage operation"""
+        with self._lock:
+            return {
+                "backend": self.name,
+                "operations": {
+                    op: {
+                        "count": sketch.count,
+                        "mean_ms": sketch.total / sketch.count,
+                        "p50_ms": sketch.quantile(0.5),
+                        "p95_ms": sketch.quantile(0.95),
+                        "p99_ms": sketch.quantile(0.99),
+                        "max_ms": sketch.max,
+                    }
+                    for op, sketch in sorted(self._latency.items())
+                },
+            }
+
+
+def create_storage() -> TimedStorage:
+    """Storage selected by STORAGE_BACKEND (`firestore` by default, or `sqlite`)"""
+    backend = os.getenv("STORAGE_BACKEND", "firestore").lower()
+    if backend == "sqlite":
+        return TimedStorage(SQLiteStorage(os.getenv("SQLITE_PATH", "agrobot.db")))
+    if backend == "firestore":
+        from firebase_admin import firestore
+        return TimedStorage(FirestoreStorage(firestore.client()))
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected 'firestore' or 'sqlite'")
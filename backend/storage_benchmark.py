@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+from storage import create_storage
+
+CROPS = ["Rice", "Maize", "Wheat", "Cotton(lint)", "Sugarcane"]
+
+
+def run(storage, users: int, farms_per_user: int, predictions_per_user: int):
+    """Replay the request pattern of the API (farm setup, predictions, dashboard reads)"""
+    base = datetime.utcnow() - timedelta(days=30)
+    for u in range(users):
+        uid = f"bench-{u}-{uuid.uuid4().hex[:8]}"
+        storage.update_profile(uid, {"name": f"User {u}", "email": f"user{u}@example.com", "updated_at": base})
+
+        farm_ids = []
+        for f in range(farms_per_user):
+            farm_id = str(uuid.uuid4())
+            farm_ids.append(farm_id)
+            storage.add_farm(uid, farm_id, {
+                "farm_id": farm_id,
+                "name": f"Farm {f}",
+                "location": {"lat": 20.0 + f, "lon": 85.0 + f},
+                "soil_type": "Loamy",
+                "area_ha": 1.5,
+                "created_at": base,
+            })
+
+        for p in range(predictions_per_user):
+            request_id = str(uuid.uuid4())
+            farm_id = random.choice(farm_ids)
+            crop = random.choice(CROPS)
+            created_at = base + timedelta(minutes=p)
+            storage.create_prediction(uid, request_id, {
+                "farm_id": farm_id,
+                "inputs": {"crop": crop, "area": 1.5},
+                "status": "pending",
+                "created_at": created_at,
+            })
+            storage.get_farm(uid, farm_id)
+            predicted_yield = round(random.uniform(0.5, 5.0), 2)
+            storage.complete_prediction(uid, request_id, {
+                "outputs": {"request_id": request_id, "predicted_yield_kg_per_ha": predicted_yield},
+                "status": "complete",
+                "completed_at": created_at,
+            }, farm_id, crop, predicted_yield, created_at)
+
+        storage.list_farms(uid)
+        storage.get_prediction_summary(uid)
+        storage.list_predictions(uid, limit=3)
+        storage.list_predictions(uid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-operation storage latency")
+    parser.add_argument("--backend", choices=["sqlite", "firestore"], default="sqlite",
+                        help="firestore writes the benchmark users into the configured project")
+    parser.add_argument("--sqlite-path", help="database file (defaults to a temporary file)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--farms", type=int, default=3)
+    parser.add_argument("--predictions", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if args.backend == "sqlite":
+        os.environ["SQLITE_PATH"] = args.sqlite_path or os.path.join(tempfile.mkdtemp(), "bench.db")
+    else:
+        import firebase_admin
+        from firebase_admin import credentials
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate("firebase-service-account.json"))
+
+    storage = create_storage()
+    run(storage, args.users, args.farms, args.predictions)
+
+    timings = storage.timings()
+    print(f"📊 Storage latency ({timings['backend']})")
+    print(f"{'operation':<28}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for op, stats in timings["operations"].items():
+        print(f"{op:<28}{stats['count']:>8}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}"
+              f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
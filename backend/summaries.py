@@ -0,0 +1,121 @@
+from datetime import datetime
+from typing import Collection, Dict, Iterable, Optional
+
+# Document under users/{uid}/summaries holding the prediction aggregates
+PREDICTION_SUMMARY_DOC = "predictions"
+
+# by_crop key for crops the model does not know, so clients cannot add keys at will
+UNKNOWN_CROP = "unknown"
+
+
+def _increment_stats(value: float) -> Dict:
+    # Imported here so the SQLite backend does not need firebase_admin
+    from firebase_admin import firestore
+
+    return {
+        "count": firestore.Increment(1),
+        "sum": firestore.Increment(value),
+        "min": firestore.Minimum(value),
+        "max": firestore.Maximum(value),
+    }
+
+
+def summary_crop(crop: str, crops: Collection[str]) -> str:
+    """by_crop key for a prediction's crop: the crop itself if the model knows it"""
+    return crop if crop in crops else UNKNOWN_CROP
+
+
+def summary_update(request_id: str, farm_id: Optional[str], crop: str, predicted_yield: float,
+                   created_at: datetime) -> Dict:
+    """
+    Field transforms that fold one completed prediction into the summary document.
+
+    Meant for `set(..., merge=True)`, so the document and nested maps are created on
+    first use and concurrent predictions never overwrite each other's counts. `crop`
+    should already be mapped with summary_crop(); pass farm_id=None for farms the
+    user does not own so they get no by_farm entry.
+    """
+    update = _increment_stats(predicted_yield)
+    update["by_crop"] = {crop: _increment_stats(predicted_yield)}
+    if farm_id is not None:
+        update["by_farm"] = {farm_id: _increment_stats(predicted_yield)}
+    update["latest"] = {
+        "request_id": request_id,
+        "farm_id": farm_id,
+        "crop": crop,
+        "predicted_yield_kg_per_ha": predicted_yield,
+        "created_at": created_at,
+    }
+    update["updated_at"] = datetime.utcnow()
+    return update
+
+
+def _add(stats: Dict, value: float):
+    stats["count"] = stats.get("count", 0) + 1
+    stats["sum"] = stats.get("sum", 0.0) + value
+    stats["min"] = min(stats.get("min", value), value)
+    stats["max"] = max(stats.get("max", value), value)
+
+
+def summary_from_predictions(predictions: Iterable[Dict], crops: Collection[str],
+                             farm_ids: Collection[str]) -> Dict:
+    """
+    Build the summary document from scratch out of stored prediction documents.
+
+    Used once per user to fold in history written before summaries existed; the
+    result is marked `backfilled` so later reads stay O(1). Keys are bounded the
+    same way as in summary_update(): unknown crops share one bucket and farms not
+    in `farm_ids` are left out of by_farm.
+    """
+    summary: Dict = {"by_crop": {}, "by_farm": {}, "latest": None}
+    for prediction in predictions:
+        if prediction.get("status") != "complete":
+            continue
+        outputs = prediction.get("outputs") or {}
+        value = outputs.get("predicted_yield_kg_per_ha")
+        if value is None:
+            continue
+
+        crop = summary_crop((prediction.get("inputs") or {}).get("crop"), crops)
+        farm_id = prediction.get("farm_id")
+        if farm_id not in farm_ids:
+            farm_id = None
+        _add(summary, value)
+        _add(summary["by_crop"].setdefault(crop, {}), value)
+        if farm_id is not None:
+            _add(summary["by_farm"].setdefault(farm_id, {}), value)
+
+        latest = summary["latest"]
+        created_at = prediction.get("created_at")
+        if latest is None or (created_at is not None and created_at > latest["created_at"]):
+            summary["latest"] = {
+                "request_id": outputs.get("request_id"),
+                "farm_id": farm_id,
+                "crop": crop,
+                "predicted_yield_kg_per_ha": value,
+                "created_at": created_at,
+            }
+
+    summary["backfilled"] = True
+    summary["updated_at"] = datetime.utcnow()
+    return summary
+
+
+def _with_mean(stats: Dict) -> Dict:
+    count = stats.get("count", 0)
+    return {
+        "count": count,
+        "mean": stats.get("sum", 0.0) / count if count else None,
+        "min": stats.get("min"),
+        "max": stats.get("max"),
+    }
+
+
+def summary_response(summary: Optional[Dict]) -> Dict:
+    """Shape a stored summary document for the API, deriving means from sums"""
+    summary = summary or {}
+    response = _with_mean(summary)
+    response["by_crop"] = {crop: _with_mean(stats) for crop, stats in (summary.get("by_crop") or {}).items()}
+    response["by_farm"] = {farm: _with_mean(stats) for farm, stats in (summary.get("by_farm") or {}).items()}
+    response["latest"] = summary.get("latest")
+    return response
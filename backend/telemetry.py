@@ -0,0 +1,274 @@
+import bisect
+import math
+import os
+import threading
+from typing import Dict, List, Optional
+
+import joblib
+
+# Quantiles reported for every numeric feature
+REPORT_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style).
+
+    Quantiles are accurate to `relative_accuracy` of the true value. Memory is
+    bounded by `max_bins` buckets per sign, and the lowest-magnitude buckets are
+    merged once that limit is reached.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 512):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self.log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def _insert(self, store: Dict[int, int], magnitude: float):
+        key = self._key(magnitude)
+        store[key] = store.get(key, 0) + 1
+        if len(store) > self.max_bins:
+            lowest, second = sorted(store)[:2]
+            store[second] += store.pop(lowest)
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value > 1e-9:
+            self._insert(self.positive, value)
+        elif value < -1e-9:
+            self._insert(self.negative, -value)
+        else:
+            self.zero += 1
+
+    def _ordered(self):
+        """(representative value, count) pairs in ascending value order"""
+        for key in sorted(self.negative, reverse=True):
+            yield -self._value(key), self.negative[key]
+        if self.zero:
+            yield 0.0, self.zero
+        for key in sorted(self.positive):
+            yield self._value(key), self.positive[key]
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, count in self._ordered():
+            seen += count
+            if seen > rank:
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class HeavyHitters:
+    """Space-Saving top-k counter: counts are overestimated by at most the smallest tracked count"""
+
+    def __init__(self, capacity: int = 32):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.total = 0
+
+    def add(self, item: str):
+        self.total += 1
+        if item in self.counts or len(self.counts) < self.capacity:
+            self.counts[item] = self.counts.get(item, 0) + 1
+            return
+        victim = min(self.counts, key=self.counts.get)
+        self.counts[item] = self.counts.pop(victim) + 1
+
+    def top(self, n: int = 10) -> List[tuple]:
+        return sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+class BinCounter:
+    """
+    Exact counts of values in fixed right-closed bins (-inf, e1], ..., (ek, inf),
+    plus how many values fell outside the training [low, high] range.
+    """
+
+    def __init__(self, edges: List[float], low: float, high: float):
+        self.edges = edges
+        self.low = low
+        self.high = high
+        self.counts = [0] * (len(edges) + 1)
+        self.below = 0
+        self.above = 0
+        self.total = 0
+
+    def add(self, value: float):
+        self.total += 1
+        self.counts[bisect.bisect_left(self.edges, value)] += 1
+        if value < self.low:
+            self.below += 1
+        elif value > self.high:
+            self.above += 1
+
+    def psi(self, shares: List[float]) -> Optional[float]:
+        """Population stability index against the training share of each bin"""
+        if self.total == 0:
+            return None
+        psi = 0.0
+        for count, expected in zip(self.counts, shares):
+            actual = max(count / self.total, 1e-4)
+            expected = max(expected, 1e-4)
+            psi += (actual - expected) * math.log(actual / expected)
+        return psi
+
+
+class _ModelStats:
+    def __init__(self):
+        self.requests = 0
+        self.numeric: Dict[str, QuantileSketch] = {}
+        self.bins: Dict[str, BinCounter] = {}
+        self.categorical: Dict[str, HeavyHitters] = {}
+        self.missing: Dict[str, int] = {}
+        self.unknown: Dict[str, int] = {}
+        self.flags: Dict[str, int] = {}
+
+
+class InputTelemetry:
+    """
+    Constant-memory view of the inputs each model version receives.
+
+    Numeric features go into quantile sketches (and, when training stats are
+    loaded, exact counts over the training bins for PSI), categorical features
+    into heavy-hitter counters with missing/unknown rates, and boolean flags (for
+    example decision table hits) into plain counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[tuple, _ModelStats] = {}
+        self.training_stats: Dict[str, Dict] = {}
+
+    def record(self, model: str, version: str,
+               numeric: Optional[Dict[str, Optional[float]]] = None,
+               categorical: Optional[Dict[str, Optional[str]]] = None,
+               unknown: Optional[Dict[str, bool]] = None,
+               flags: Optional[Dict[str, bool]] = None):
+        with self._lock:
+            stats = self._models.get((model, version))
+            if stats is None:
+                stats = self._models[(model, version)] = _ModelStats()
+            stats.requests += 1
+
+            for name, value in (numeric or {}).items():
+                if value is None or not math.isfinite(value):
+                    stats.missing[name] = stats.missing.get(name, 0) + 1
+                    continue
+                stats.numeric.setdefault(name, QuantileSketch()).add(float(value))
+                counter = stats.bins.get(name)
+                if counter is None:
+                    reference = self.training_stats.get(model, {}).get("numeric", {}).get(name)
+                    if reference and reference.get("bins"):
+                        counter = stats.bins[name] = BinCounter(
+                            reference["bins"]["edges"], reference["min"], reference["max"]
+                        )
+                if counter is not None:
+                    counter.add(float(value))
+
+            for name, value in (categorical or {}).items():
+                if value is None or value == "":
+                    stats.missing[name] = stats.missing.get(name, 0) + 1
+                    continue
+                stats.categorical.setdefault(name, HeavyHitters()).add(str(value))
+
+            for name, is_unknown in (unknown or {}).items():
+                stats.unknown.setdefault(name, 0)
+                if is_unknown:
+                    stats.unknown[name] += 1
+
+            for name, flag in (flags or {}).items():
+                stats.flags.setdefault(name, 0)
+                if flag:
+                    stats.flags[name] += 1
+
+    def load_training_stats(self, model_path: str = "ml_models"):
+        """Load `<model>_training_stats.pkl` files written by scripts/setup_ml_model.py"""
+        for model in ("yield", "fertilizer"):
+            path = os.path.join(model_path, f"{model}_training_stats.pkl")
+            if os.path.exists(path):
+                try:
+                    self.training_stats[model] = joblib.load(path)
+                except Exception as e:
+                    print(f"⚠️ Could not load {path}: {e}")
+
+    def report(self) -> Dict:
+        with self._lock:
+            return {
+                "models": [
+                    self._report_model(model, version, stats)
+                    for (model, version), stats in sorted(self._models.items())
+                ]
+            }
+
+    def _report_model(self, model: str, version: str, stats: _ModelStats) -> Dict:
+        training = self.training_stats.get(model, {})
+        requests = max(stats.requests, 1)
+
+        numeric = {}
+        for name, sketch in stats.numeric.items():
+            entry = {
+                "count": sketch.count,
+                "missing_rate": stats.missing.get(name, 0) / requests,
+                "min": sketch.min,
+                "max": sketch.max,
+                "mean": sketch.total / sketch.count,
+                "quantiles": {f"p{round(q * 100):02d}": sketch.quantile(q) for q in REPORT_QUANTILES},
+            }
+            reference = training.get("numeric", {}).get(name)
+            if reference:
+                entry["training"] = reference
+                counter = stats.bins.get(name)
+                if counter is not None and counter.total:
+                    entry["psi"] = counter.psi(reference["bins"]["shares"])
+                    entry["out_of_range_rate"] = (counter.below + counter.above) / counter.total
+            numeric[name] = entry
+
+        categorical = {}
+        for name, hitters in stats.categorical.items():
+            reference = training.get("categorical", {}).get(name, {})
+            categorical[name] = {
+                "count": hitters.total,
+                "missing_rate": stats.missing.get(name, 0) / requests,
+                "top": [
+                    {
+                        "value": value,
+                        "share": count / hitters.total,
+                        "training_share": reference.get(value, 0.0) if reference else None,
+                    }
+                    for value, count in hitters.top()
+                ],
+            }
+
+        for name, count in stats.unknown.items():
+            categorical.setdefault(name, {})["unknown_rate"] = count / requests
+
+        return {
+            "model": model,
+            "version": version,
+            "requests": stats.requests,
+            "numeric": numeric,
+            "categorical": categorical,
+            "flags": {name: count / requests for name, count in stats.flags.items()},
+        }
+
+
+telemetry = InputTelemetry()
@@ -77,6 +77,10 @@ class ApiClient {
     return this.request<{ predictions: any[] }>("/api/get-predictions")
   }
 
+  async getSummary() {
+    return this.request<{ summary: any; recent_predictions: any[] }>("/api/summary")
+  }
+
   // Profile management
   async updateProfile(profileData: {
     name: string
@@ -24,6 +24,53 @@ def download_dataset():
         print(f"❌ Failed to download dataset: {response.status_code}")
         return False
 
+def summarize_training_data(df, numeric, categorical):
+    """Training-set stats that backend/telemetry.py compares live inputs against"""
+    stats = {"numeric": {}, "categorical": {}}
+    for name, col in numeric.items():
+        values = df[col].astype(float)
+        deciles = [float(v) for v in values.quantile([i / 10 for i in range(11)])]
+        # Repeated deciles (e.g. a feature that is mostly 0) would give empty bins,
+        # so keep the distinct interior edges and record each bin's real share
+        edges = sorted(set(deciles[1:-1]))
+        bin_index = np.searchsorted(edges, values.to_numpy(), side="left")
+        shares = np.bincount(bin_index, minlength=len(edges) + 1) / len(values)
+        stats["numeric"][name] = {
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "mean": float(values.mean()),
+            "quantiles": deciles,
+            "bins": {"edges": edges, "shares": [float(v) for v in shares]},
+        }
+    for name, col in categorical.items():
+        freq = df[col].astype(str).value_counts(normalize=True)
+        stats["categorical"][name] = {str(k): float(v) for k, v in freq.items()}
+    return stats
+
+def save_fertilizer_training_stats():
+    """Save input stats for the fertilizer model from its training dataset"""
+    dataset = "../backend/fertilizer_dataset.csv"
+    if not os.path.exists(dataset):
+        print(f"⚠️ {dataset} not found, skipping fertilizer training stats")
+        return False
+
+    df = pd.read_csv(dataset)
+    stats = summarize_training_data(
+        df,
+        numeric={
+            "temperature": "Temparature",
+            "humidity": "Humidity ",
+            "moisture": "Moisture",
+            "nitrogen": "Nitrogen",
+            "phosphorous": "Phosphorous",
+            "potassium": "Potassium",
+        },
+        categorical={"soil_type": "Soil Type", "crop_type": "Crop Type"},
+    )
+    joblib.dump(stats, "../backend/ml_models/fertilizer_training_stats.pkl")
+    print("- ../backend/ml_models/fertilizer_training_stats.pkl")
+    return True
+
 def train_model():
     """Train the crop yield prediction model"""
     
@@ -108,6 +155,23 @@ def train_model():
         # Save crop names mapping
         crop_mapping = dict(zip(le.classes_, le.transform(le.classes_)))
         joblib.dump(crop_mapping, "../backend/ml_models/crop_mapping.pkl")
+
+        # Save input distribution of the training split for drift monitoring
+        training_stats = summarize_training_data(
+            df.loc[X_train.index],
+            numeric={
+                "area": "Area",
+                "rainfall": "Annual_Rainfall",
+                "fertilizer": "Fertilizer",
+                "pesticide": "Pesticide",
+            },
+            categorical={},
+        )
+        training_stats["categorical"]["crop"] = {
+            str(crop): float(freq)
+            for crop, freq in pd.Series(le.inverse_transform(X_train["Crop"])).value_counts(normalize=True).items()
+        }
+        joblib.dump(training_stats, "../backend/ml_models/yield_training_stats.pkl")
         
         print("\n✅ Model and artifacts saved successfully!")
         print("Files saved:")
@@ -115,6 +179,9 @@ def train_model():
         print("- ../backend/ml_models/label_encoder.pkl")
         print("- ../backend/ml_models/feature_names.pkl")
         print("- ../backend/ml_models/crop_mapping.pkl")
+        print("- ../backend/ml_models/yield_training_stats.pkl")
+
+        save_fertilizer_training_stats()
         
         return True
         